@@ -1,69 +1,128 @@
 import os
-import csv
-from collections import defaultdict
-import matplotlib.pyplot as plt
+import heapq
+import operator
+import numpy as np
+import pandas as pd
 
-def read_csv_files(folder_path):
-    word_counts = defaultdict(int)
+# Vocabulary size above which rank_words selects with NumPy rather than a heap
+NUMPY_SELECT_THRESHOLD = 100_000
+
+def _iter_csv_paths(folder_path):
+    # Yield the paths of all CSV files in the given folder
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.endswith(".csv") and entry.is_file(follow_symlinks=False):
+                yield entry.path
+
+def _sum_counts(parts):
+    # Combine partial word counts into a single total per word
+    return pd.concat(parts).groupby(level=0, sort=False).sum()
+
+def read_csv_files(folder_path, chunksize=200_000):
+    parts = []
+    pending = 0
     
     # Loop through all CSV files in the given folder
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".csv"):
-            file_path = os.path.join(folder_path, filename)
-            
-            with open(file_path, 'r', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                for row in reader:
-                    if len(row) == 2:
-                        word, count = row
-                        try:
-                            count = int(count)
-                            word_counts[word] += count
-                        except ValueError:
-                            print(f"Skipping invalid count for word '{word}' in file {filename}")
+    for file_path in _iter_csv_paths(folder_path):
+        # Read counts as strings so invalid entries can be reported rather than aborting the parse.
+        # Files are read in chunks so peak memory is bounded by the chunk size, not the file size.
+        with pd.read_csv(file_path, header=None, names=['word', 'count'], dtype='string', encoding='utf-8',
+                         engine='c', on_bad_lines='skip', keep_default_na=False, chunksize=chunksize) as chunks:
+            for df in chunks:
+                # Rows without a count field are skipped silently (keep_default_na reads them as '')
+                df = df[df['count'] != '']
+                df['count'] = df['count'].str.strip()
+                
+                valid = df['count'].str.fullmatch(r'[+-]?\d+')
+                for word in df.loc[~valid, 'word']:
+                    print(f"Skipping invalid count for word '{word}' in file {os.path.basename(file_path)}")
+                
+                df = df[valid]
+                parts.append(df['count'].astype('int64').groupby(df['word'], sort=False).sum())
+                pending += len(parts[-1])
+                
+                # Fold the partial sums together once they outgrow a chunk, rather than after every chunk
+                if pending > chunksize:
+                    parts = [_sum_counts(parts)]
+                    pending = 0
+    
+    if not parts:
+        return pd.Series(dtype='int64')
     
-    return word_counts
+    return _sum_counts(parts)
 
-def rank_words(word_counts):
-    # Sort words by count in descending order
-    ranked_words = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
+def rank_words(word_counts, top_n=20):
+    # Select the top n words by count in descending order
+    if len(word_counts) > NUMPY_SELECT_THRESHOLD and 0 < top_n < len(word_counts):
+        # For large vocabularies, partition the counts array in O(N) and only sort the top n
+        if not isinstance(word_counts, pd.Series):
+            word_counts = pd.Series(word_counts)
+        
+        words = word_counts.index.to_numpy()
+        counts = word_counts.to_numpy()
+        
+        # Keep every word above the cut-off count, then the first-seen words tied at it
+        cutoff = -np.partition(-counts, top_n - 1)[top_n - 1]
+        above = np.flatnonzero(counts > cutoff)
+        tied = np.flatnonzero(counts == cutoff)[:top_n - len(above)]
+        
+        # Order by count, breaking ties by first appearance, matching heapq.nlargest
+        top_idx = np.concatenate((above, tied))
+        top_idx = top_idx[np.lexsort((top_idx, -counts[top_idx]))]
+        return list(zip(words[top_idx].tolist(), counts[top_idx].tolist()))
+    
+    ranked_words = heapq.nlargest(top_n, word_counts.items(), key=operator.itemgetter(1))
     return ranked_words
 
-def display_ranking(ranked_words, top_n=20):
+def display_ranking(ranked_words):
     print(f"{'Rank':<5}{'Word':<15}{'Count':<10}")
     print('-' * 30)
     
-    for rank, (word, count) in enumerate(ranked_words[:top_n], 1):
+    for rank, (word, count) in enumerate(ranked_words, 1):
         print(f"{rank:<5}{word:<15}{count:<10}")
 
-def plot_word_counts(ranked_words, top_n=20):
+def plot_word_counts(ranked_words, save_path=None):
     # Get the top n words and their counts
-    words = [word for word, count in ranked_words[:top_n]]
-    counts = [count for word, count in ranked_words[:top_n]]
+    words = [word for word, count in ranked_words]
+    counts = [count for word, count in ranked_words]
 
+    # matplotlib is imported here so the counting helpers can be used without loading it.
+    # A standalone Figure can be saved without pyplot, so saving never touches the GUI backend.
+    if save_path:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(12, 8))
+    else:
+        import matplotlib.pyplot as plt
+        # Reuse the figure from any previous call
+        fig = plt.figure(num='Top Words', figsize=(12, 8), clear=True)
+    
     # Create the bar plot
-    plt.figure(figsize=(12, 8))
-    plt.bar(words, counts, color='skyblue')
+    ax = fig.subplots()
+    bars = ax.bar(words, counts, color='skyblue')
     
     # Add labels and title
-    plt.xlabel('Words')
-    plt.ylabel('Counts')
-    plt.title('Top Words by Occurrence')
-    plt.xticks(rotation=45, ha='right')
+    ax.set_xlabel('Words')
+    ax.set_ylabel('Counts')
+    ax.set_title('Top Words by Occurrence')
+    ax.set_xticks(range(len(words)), labels=words, rotation=45, ha='right')
     
     # Add count labels on top of the bars
-    for i in range(len(words)):
-        plt.text(i, counts[i], str(counts[i]), ha='center', va='bottom')
+    ax.bar_label(bars, padding=3)
+    
+    # Save or show the plot
+    fig.tight_layout()
     
-    # Show the plot
-    plt.tight_layout()
-    plt.show()
+    if save_path:
+        fig.savefig(save_path)
+    else:
+        plt.show()
 
 # Main function to execute the steps
-def main(folder_path, top_n=20):
+def main(folder_path, top_n=20, save_path=None):
     word_counts = read_csv_files(folder_path)
-    ranked_words = rank_words(word_counts)
-    display_ranking(ranked_words, top_n)
-    plot_word_counts(ranked_words, top_n)
+    ranked_words = rank_words(word_counts, top_n)
+    display_ranking(ranked_words)
+    plot_word_counts(ranked_words, save_path)
 
-main("words/firefly", top_n=100)
\ No newline at end of file
+if __name__ == "__main__":
+    main("words/firefly", top_n=100)
@@ -22,17 +22,55 @@ External Dependencies:
     - pandas
     - matplotlib (soft requirement. Only if generate_metrics is true)
     - openpyxl
+    - python-calamine (soft requirement. Faster .xlsx parsing, falls back to openpyxl if not installed)
 
 """
 
 import pandas as pd
-import matplotlib.pyplot as plt
 import logging
 import argparse
-from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 import sys
 from datetime import datetime
 import os
+import re
+import importlib.util
+
+# Use the Rust-based calamine reader (pandas >= 2.2) when available, otherwise pandas' default engine
+_PANDAS_VERSION = tuple(int(part) for part in pd.__version__.split(".")[:2])
+
+if importlib.util.find_spec("python_calamine") is not None and _PANDAS_VERSION >= (2, 2):
+    EXCEL_ENGINE = "calamine"
+else:
+    EXCEL_ENGINE = None
+
+logger = logging.getLogger(__name__)
+
+_SCRIPT_NAME = os.path.basename(__file__)
+
+# Format of the 'created' timestamp in chapter metadata
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Number of chapters from which rendering is spread across worker processes
+PARALLEL_MIN_CHAPTERS = 500
+
+# Markdown for a single scene, up to and including its setting heading
+_SCENE_TEMPLATE = (
+    "### Scene {n}\n\n"
+    " - POV: {pov}\n"
+    " - Date and Time: {time}\n"
+    " - Day: {day}\n"
+    " - Week: {week}\n"
+    " - Temperature: {temp}\n"
+    " - Weather: {weather}\n"
+    " - Uniform: {uniform}\n\n"
+    " - Description: {desc}\n\n"
+    " #### Setting:\n"
+)
+
+# Separator between the parts of a scene's location
+_DOT_SPLIT = re.compile(r"\.\s+")
 
 def setup_logging(log_file):
     """Sets up the logging configuration."""
@@ -44,163 +82,162 @@ def setup_logging(log_file):
         filemode='w'
     )
     
-def get_number_of_rows(file_path, sheet_name):
-    try:
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
-
-        num_rows = df.shape[0]
-        return num_rows
-    except FileNotFoundError:
-        print(f"Error: The file {file_path} was not found.")
-        return None
-    except Exception as e:
-        print(f"Error: An error occurred while reading the file {file_path}: {e}")
-        return None
-
 def read_excel_file(file_path, sheet_name):
     
     """Reads the Excel file and returns a DataFrame."""
     
-    logging.info(f"Attempting to parse sheet: '{sheet_name}' in file: '{file_path}'.")
+    logger.info("Attempting to parse sheet: '%s' in file: '%s'.", sheet_name, file_path)
     print(f"Attempting to parse sheet: '{sheet_name}' in file: '{file_path}'.")
     
     try:
-        df = pd.read_excel(file_path, sheet_name = sheet_name)
+        df = pd.read_excel(file_path, sheet_name = sheet_name, engine = EXCEL_ENGINE)
         print(f"Successfully read sheet: '{sheet_name}' in file: '{file_path}'.")
-        logging.info(f"Successfully read sheet: '{sheet_name}' in file: '{file_path}'.")
+        logger.info("Successfully read sheet: '%s' in file: '%s'.", sheet_name, file_path)
         return df
     
     except FileNotFoundError:
         print(f"\nError: The file {file_path} could not be found.")
-        logging.error(f"Error: The file '{file_path}' could not be found.")
+        logger.error("Error: The file '%s' could not be found.", file_path)
         sys.exit(1)
         
         
     except IOError as e:
         print(f"\nError: An error occurred while reading {file_path}. Please check that the file is not open in another program.")
-        logging.error(f"Error: An error occurred while reading {file_path}. Please check that the file is not open in another program.")
+        logger.error("Error: An error occurred while reading %s. Please check that the file is not open in another program.", file_path)
         sys.exit(1)
         
         
     except Exception as e:
         print(f"\nError: An error occurred while reading sheet: '{sheet_name}' in file: '{file_path}': {e}")
-        logging.error(f"Error: An error occurred while reading sheet: '{sheet_name}' in file: '{file_path}': {e}")
+        logger.error("Error: An error occurred while reading sheet: '%s' in file: '%s': %s", sheet_name, file_path, e)
         sys.exit(1)
         
         
+def split_location_parts(parts):
+    """Splits each part of a location into its major location and a list of minor locations."""
+    if not isinstance(parts, list):
+        return []
+    
+    tokens = []
+    for part in parts:
+        major_loc, sep, minors = part.partition(" - ")
+        tokens.append((major_loc, [loc for minor in minors.split(" - ") for loc in minor.split(", ")] if sep else []))
+    return tokens
+
 def parse_scenes(df, num_rows):
     
-    logging.info(f"Parsing {num_rows} scenes.")
+    logger.info("Parsing %s scenes.", num_rows)
     
     try:
+        # Tokenise every location once up front, so rendering needs no further splitting.
+        # Coerce to strings first, as a column with no text (e.g. left blank) is read as floats.
+        settings = df["Location"].astype("string").str.split(_DOT_SPLIT).apply(split_location_parts)
+        
+        # Build each chapter's scene lists column-wise rather than row by row
         chapters = {}
-        for index, row in df.iterrows():
-            week = row["Week"]
-            arc = row["Arc"]
-            chapter = row["Chapter"]
-            setting = row["Location"]
-            uniform = row["Uniform"]
-            time = row["Time"]
-            weather = row["Weather"]
-            day = row["Day"]
-            description = row['Description']
-            pov = row["POV"]
-            temp = row["Temperature"]
-            
-            if chapter not in chapters:
-                    chapters[chapter] = {'scenes': [], 'settings': [], 'scene_counter': 1, 'day': [], 'POV': '', 'description': '', 'time': [], 'weather': [], 'descriptions': [], 'uniform': [], 'arc': 1, 'week': []}
-
-            chapters[chapter]['scenes'].append(chapters[chapter]['scene_counter'])
-            chapters[chapter]['arc'] = arc
-            chapters[chapter]['scene_counter'] += 1
-            chapters[chapter]['day'].append(day)
-            chapters[chapter]['settings'].append(setting)
-            chapters[chapter]['uniform'].append(uniform)
-            chapters[chapter]['weather'].append(weather)
-            chapters[chapter]['time'].append(time)
-            chapters[chapter]['descriptions'].append(description)
-            chapters[chapter]["POV"] = pov
-            chapters[chapter]["temperature"] = temp
-            chapters[chapter]["week"].append(week)
+        for chapter, group in df.groupby("Chapter", sort=False, dropna=False):
+            chapters[chapter] = {
+                'scenes': list(range(1, len(group) + 1)),
+                'settings': settings.loc[group.index].tolist(),
+                'day': group["Day"].tolist(),
+                'time': group["Time"].tolist(),
+                'weather': group["Weather"].tolist(),
+                'descriptions': group['Description'].tolist(),
+                'uniform': group["Uniform"].tolist(),
+                'week': group["Week"].tolist(),
+                'arc': group["Arc"].iloc[-1],
+                'POV': group["POV"].iloc[-1],
+                'temperature': group["Temperature"].iloc[-1],
+            }
 
-                
-        logging.info(f"Successfully parsed {num_rows} scenes into {len(chapters)} chapters.")
+        logger.info("Successfully parsed %s scenes into %s chapters.", num_rows, len(chapters))
                
         return chapters
     except Exception as e:
         print(f"Error: An error occurred while parsing scenes: {e}")
-        logging.error(f"Error: An error occurred while parsing scenes: {e}")
+        logger.error("Error: An error occurred while parsing scenes: %s", e)
         
-def generate_markdown_content(chapters, tags, output_dir, am = True):
-    """Generates Markdown content from the parsed data."""
+def _render_chapter(args):
+    """Renders the Markdown content for a single chapter."""
     
-    logging.info(f"Generating .md markdown files for {len(chapters)} chapters.")
+    chapter_key, chapter_data, tags, am, now_str = args
     
     try:
+        buf = []
+
+        # add metadata
+        if am == True:
+            buf.append(add_metadata('', pov = chapter_data["POV"], tags = ", ".join(tags), arc = chapter_data["arc"], now_str = now_str))
         
-        for chapter_key, chapter_data in chapters.items():
-            
-            markdown_content = ''
+        buf.append(f"# Chapter {chapter_key}\n")
+        
+        scenes = chapter_data["scenes"]
+        days = chapter_data["day"]
+        descriptions = chapter_data["descriptions"]
+        pov = chapter_data["POV"]
+        uniform = chapter_data["uniform"]
+        weather = chapter_data["weather"]
+        settings = chapter_data["settings"]
+        time = chapter_data["time"]
+        temp = chapter_data["temperature"]
+        week = chapter_data["week"]
+        
+        buf.append(f"## Scenes\n")
 
-            # add metadata
-            if am == True:
-                markdown_content = add_metadata(markdown_content, pov = chapter_data["POV"], tags = ", ".join(tags), arc = chapter_data["arc"])
-            
-            markdown_content += f"# Chapter {chapter_key}\n"
+        for scene_number, day, desc, wk, wea, uni, tm, setting in zip(scenes, days, descriptions, week, weather, uniform, time, settings):
             
-            scenes = chapter_data["scenes"]
-            days = chapter_data["day"]
-            descriptions = chapter_data["descriptions"]
-            pov = chapter_data["POV"]
-            uniform = chapter_data["uniform"]
-            weather = chapter_data["weather"]
-            settings = chapter_data["settings"]
-            time = chapter_data["time"]
-            temp = chapter_data["temperature"]
-            week = chapter_data["week"]
+            buf.append(_SCENE_TEMPLATE.format(n = scene_number, pov = pov, time = tm, day = day, week = wk, temp = temp,
+                                              weather = wea, uniform = uni, desc = desc))
             
-            markdown_content += f"## Scenes\n"
+            for major_loc, min_locs in setting:
+                buf.append(f" - {major_loc}\n")
+                for j in min_locs:
+                    buf.append(f"     - {j}\n")
+                        
+            buf.append("\n")
         
-            for i in range(len(scenes)):
-                scene_number = i + 1
-                
-                markdown_content += f"### Scene {scene_number}\n\n"
-                markdown_content += f" - POV: {pov}\n"
-                markdown_content += f" - Date and Time: {time[i]}\n" 
-                markdown_content += f" - Day: {days[i]}\n"
-                markdown_content += f" - Week: {week[i]}\n"
-                markdown_content += f" - Temperature: {temp}\n"
-                markdown_content += f" - Weather: {weather[i]}\n"
-                markdown_content += f" - Uniform: {uniform[i]}\n\n"
-                markdown_content += f" - Description: {descriptions[i]}\n\n"
-                
-                markdown_content += f" #### Setting:\n"
-                
-                parts = settings[i].split(". ")
-
-                for subpart in parts:
-                    subsubparts = subpart.split(" - ")
-                    major_loc = subsubparts[0]
-                    markdown_content += f" - {major_loc}\n"
-                    for i in range(1, len(subsubparts)):
-                        min_locs = subsubparts[i].split(", ")
-                        for j in min_locs:
-                            pass
-                            markdown_content += f"     - {j}\n"
-                            
-                markdown_content += "\n"
-              
-            logging.info(f"Chapter {chapter_key}, Scene {scene_number} created.") 
+        return f"Chapter {chapter_key}", "".join(buf)
+    except Exception as e:
+        # Name the chapter, as the caller only sees the exception
+        raise RuntimeError(f"Chapter {chapter_key}: {e}") from e
+
+def generate_markdown_content(chapters, tags, output_dir, am = True, now_str = None):
+    """Generates Markdown content from the parsed data."""
+    
+    logger.info("Generating .md markdown files for %s chapters.", len(chapters))
+    
+    # Stamp every chapter from this run with the same creation time
+    if now_str is None:
+        now_str = datetime.now().strftime(_TIMESTAMP_FORMAT)
+    
+    try:
+        
+        os.makedirs(output_dir, exist_ok = True)
+        
+        jobs = [(key, data, tags, am, now_str) for key, data in chapters.items()]
+        
+        # Chapters are independent, but rendering one is cheap, so worker processes only pay off for many chapters.
+        # Files are always written from this process.
+        parallel = len(jobs) >= PARALLEL_MIN_CHAPTERS
+        
+        with ProcessPoolExecutor(max_workers = os.cpu_count()) if parallel else nullcontext() as executor:
+            rendered = executor.map(_render_chapter, jobs) if parallel else map(_render_chapter, jobs)
             
-            write_markdown(f"Chapter {chapter_key}", output_dir = output_dir, content = markdown_content)              
+            for (chapter_key, chapter_data), (file_name, content) in zip(chapters.items(), rendered):
+                logger.info("Chapter %s, Scene %s created.", chapter_key, len(chapter_data['scenes'])) 
+                
+                write_markdown(file_name, output_dir = output_dir, content = content)              
     except Exception as e:
-        logging.error(f"Error: An error occured while parsing Chapter {chapter_key}, Scene {scene_number}: {e}")
-        print(f"Error: An error occured while parsing Chapter {chapter_key}, Scene {scene_number}: {e}")
+        logger.error("Error: An error occured while generating markdown: %s", e)
+        print(f"Error: An error occured while generating markdown: {e}")
         
-def add_metadata(markdown_content, arc, pov, tags):
+def add_metadata(markdown_content, arc, pov, tags, now_str = None):
+            if now_str is None:
+                now_str = datetime.now().strftime(_TIMESTAMP_FORMAT)
+            
             markdown_content += f'---\n'
-            markdown_content += f'created: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n'
-            markdown_content += f'generated_by: {os.path.basename(__file__)}\n'
+            markdown_content += f'created: {now_str}\n'
+            markdown_content += f'generated_by: {_SCRIPT_NAME}\n'
             markdown_content += f'tags: {tags}\n'
             markdown_content += f'POV: {pov}\n'
             markdown_content += f'Arc: {arc}\n'
@@ -210,29 +247,27 @@ def add_metadata(markdown_content, arc, pov, tags):
 
 def write_markdown(file_path, output_dir, content):
     """Writes a .md markdown file"""
-    logging.info(f"Writing .md file at '/{output_dir}/{file_path}.md'")
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    logger.info("Writing .md file at '/%s/%s.md'", output_dir, file_path)
 
     try:
-        with open(f"./{output_dir}/{file_path}.md", 'w') as file:
+        with open(f"./{output_dir}/{file_path}.md", 'w', buffering = 65536, encoding = 'utf-8') as file:
             file.write(content)
-        logging.info(f"Markdown file saved successfully: '/{output_dir}/{file_path}.md'")
+        logger.info("Markdown file saved successfully: '/%s/%s.md'", output_dir, file_path)
     except Exception as e:
-        logging.error(f"Error: An error occurred while saving the file '/{output_dir}/{file_path}.md': {e}")
+        logger.error("Error: An error occurred while saving the file '/%s/%s.md': %s", output_dir, file_path, e)
         print(f"Error: An error occurred while saving the file '/{output_dir}/{file_path}.md': {e}")
         
 def generate_metrics(df, save, output_dir):
     
-    days = df["Day"]
-    weather = df["Weather"]
+    # Imported here so runs without --generate_metrics skip loading matplotlib
+    import matplotlib.pyplot as plt
     
     # Count the occurrences of each unique string
-    counter = Counter(days)
-    labels, counts = zip(*counter.items())
+    day_counts = df["Day"].value_counts(sort = False)
+    labels, counts = day_counts.index.tolist(), day_counts.values
 
     # Bar Chart
-    plt.figure(figsize=(10, 5))
+    fig = plt.figure(num='Days of the Week', figsize=(10, 5), clear=True)
     plt.bar(labels, counts, color='skyblue')
     plt.xlabel('Day of the Week')
     plt.ylabel('Count')
@@ -245,11 +280,13 @@ def generate_metrics(df, save, output_dir):
             pass
         plt.savefig(f"{output_dir}/images/days.png")
         plt.show()
+    
+    plt.close(fig)
 
-    counter = Counter(weather)
-    labels,counts = zip(*counter.items())
+    weather_counts = df["Weather"].value_counts(sort = False)
+    labels, counts = weather_counts.index.tolist(), weather_counts.values
     # Bar Chart
-    plt.figure(figsize=(10, 5))
+    fig = plt.figure(num='Weather', figsize=(10, 5), clear=True)
     plt.pie(list(counts), labels = list(labels), autopct='%1.1f%%')
     plt.xlabel('Weather Condition')
     plt.title('Weather')
@@ -261,6 +298,8 @@ def generate_metrics(df, save, output_dir):
             pass
         plt.savefig(f"{output_dir}/images/weather.png")
         plt.show()
+    
+    plt.close(fig)
 
 def parse_items(value):
     """For argparser to process comma-separated string."""
@@ -281,23 +320,25 @@ def main():
     
     setup_logging(f"logs/{args.log_file}")
     
-    logging.info("Script started")
+    logger.info("Script started")
     print("Script started.")
 
     df = read_excel_file(args.input_file, args.sheet)
 
-    num_rows = get_number_of_rows(args.input_file, args.sheet)
+    num_rows = df.shape[0]
 
     chapters = parse_scenes(df, num_rows = num_rows)
 
-    generate_markdown_content(chapters, tags = args.tags, am = args.add_metadata, output_dir = args.output_dir)
+    now_str = datetime.now().strftime(_TIMESTAMP_FORMAT)
+
+    generate_markdown_content(chapters, tags = args.tags, am = args.add_metadata, output_dir = args.output_dir, now_str = now_str)
 
     if args.generate_metrics == True:
         generate_metrics(df, args.save, args.output_dir)
     else:
         pass
     
-    logging.info(f"Script complete. Excel file: '{args.input_file}' converted to {len(chapters)} .md files.")
+    logger.info("Script complete. Excel file: '%s' converted to %s .md files.", args.input_file, len(chapters))
     print(f"Script complete. Excel file: '{args.input_file}' converted to {len(chapters)} .md files.")
     
 if __name__ == "__main__":
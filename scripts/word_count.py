@@ -12,6 +12,13 @@ scenes_word_counts = [
     [1] # Chapter 4
 ]
 
+# Path to save the dashboard to instead of displaying it (None to display)
+output_path = None
+
+# Saving only needs the non-interactive backend, which avoids loading a GUI toolkit
+if output_path:
+    mpl.use('Agg')
+
 plt.style.use('dark_background')
 
 # Determine the number of chapters and maximum number of scenes per chapter
@@ -28,18 +35,16 @@ fig, axs = plt.subplots(2, 2, figsize=(15, 10))
 
 # Plot 1: Stacked Bar Chart of Word Counts per Scene in Each Chapter
 ax1 = axs[0, 0]
+# Right-pad each chapter's scene word counts with zeros into a (chapter x scene) array
+scene_word_count_array = np.zeros((num_chapters, max_scenes), dtype=int)
+for j, scenes in enumerate(scenes_word_counts):
+    scene_word_count_array[j, :len(scenes)] = scenes
+
 for i in range(max_scenes):
-    scene_word_counts = []
-    for j in range(num_chapters):
-        if i < len(scenes_word_counts[j]):
-            scene_word_counts.append(scenes_word_counts[j][i])
-        else:
-            scene_word_counts.append(0)
+    scene_word_counts = scene_word_count_array[:, i]
     bars = ax1.bar(chapters, scene_word_counts, bottom=bottom, label=f'Scene {i+1}', color=cmap(i))
-    for bar, wc in zip(bars, scene_word_counts):
-        if wc > 0:
-            ax1.text(bar.get_x() + bar.get_width() / 2, bar.get_y() + bar.get_height() / 2,
-                     f'{wc}', ha='center', va='center', color='white', fontsize=8, fontweight='bold')
+    ax1.bar_label(bars, labels=[str(wc) if wc > 0 else '' for wc in scene_word_counts],
+                  label_type='center', color='white', fontsize=8, fontweight='bold')
     bottom += scene_word_counts
 ax1.set_xlabel('Chapters')
 ax1.set_ylabel('Word Count')
@@ -78,9 +83,8 @@ ax3.set_title('Distribution of Scene Lengths')
 # Plot 4: Bar Chart of Number of Scenes per Chapter
 num_scenes_per_chapter = [len(scenes) for scenes in scenes_word_counts]
 ax4 = axs[1, 1]
-ax4.bar(chapters, num_scenes_per_chapter, color='skyblue')
-for i, num_scenes in enumerate(num_scenes_per_chapter):
-    ax4.text(i, num_scenes + 0.1, str(num_scenes), ha='center', va='bottom')
+bars = ax4.bar(chapters, num_scenes_per_chapter, color='skyblue')
+ax4.bar_label(bars, padding=3)
 ax4.set_xlabel('Chapters')
 ax4.set_ylabel('Number of Scenes')
 ax4.set_title('Number of Scenes per Chapter')
@@ -122,8 +126,12 @@ ax2.legend(loc='best')
 # Adjust layout to make room for the legend in the first plot
 plt.tight_layout()
 
-# Show all plots
-plt.show()
+# Save or show all plots
+if output_path:
+    plt.savefig(output_path)
+    plt.close(fig)
+else:
+    plt.show()
 
 # Print statistics
 print(f"Total word count: {total_word_count}")